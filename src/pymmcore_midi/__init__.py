@@ -1,6 +1,8 @@
 """Midi control for microscopes using pymmcore."""
 
+import warnings
 from importlib.metadata import PackageNotFoundError, version
+from typing import Any
 
 try:
     __version__ = version("pymmcore-midi")
@@ -9,16 +11,27 @@ except PackageNotFoundError:  # pragma: no cover
 
 from ._core_connect import connect_button_to_property, connect_knob_to_property
 from ._device import Button, Knob, MidiDevice
-from ._map_spec import DeviceMap, Mapping
+from ._map_spec import Binding, DeviceMap
 from ._xtouch import XTouchMini
 
 __all__ = [
+    "Binding",
     "Button",
     "connect_button_to_property",
     "connect_knob_to_property",
     "DeviceMap",
     "Knob",
-    "Mapping",
     "MidiDevice",
     "XTouchMini",
 ]
+
+
+def __getattr__(name: str) -> Any:
+    if name == "Mapping":  # deprecated name for Binding
+        warnings.warn(
+            "pymmcore_midi.Mapping is deprecated, use pymmcore_midi.Binding instead",
+            DeprecationWarning,
+            stacklevel=2,
+        )
+        return Binding
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
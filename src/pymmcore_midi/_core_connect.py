@@ -1,16 +1,242 @@
 from __future__ import annotations
 
+import threading
+import time
 import warnings
-from typing import TYPE_CHECKING, Any, Callable
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ContextManager,
+    Iterator,
+    NamedTuple,
+)
+from weakref import WeakKeyDictionary
 
 if TYPE_CHECKING:
     from pymmcore_plus import CMMCorePlus
 
     from pymmcore_midi import Button, Knob
 
+# range of values sent/received by a MIDI knob or slider
+KNOB_MIN = 0
+KNOB_MAX = 127
+# maximum rate (in Hz) at which a knob will push new values to core
+KNOB_UPDATE_RATE = 120
+# integer properties spanning at most this many values get a str -> knob lookup table
+INT_TABLE_MAX_SIZE = 1024
+
+
+class PropertyInfo(NamedTuple):
+    """The state of a device property needed to connect a MIDI control to it."""
+
+    value: str
+    limits: tuple[float, float] | None  # (lower, upper), if the property has limits
+    allowed: tuple[str, ...]
+    is_integer: bool = False  # whether the property holds integer values
+
+
+def get_property_info(
+    core: CMMCorePlus,
+    device_label: str,
+    property_name: str,
+    value: str | None = None,
+    knob: bool | None = None,
+) -> PropertyInfo:
+    """Read the PropertyInfo of `device_label.property_name` from core.
+
+    If `value` is provided (e.g. from the system state cache), the current value of
+    the property is not read from the device.  If `knob` is True, only the fields
+    used by a knob (limits and type) are read, if False only those used by a button
+    (allowed values); by default, everything is read.
+    """
+    from pymmcore_plus import PropertyType
+
+    limits = None
+    is_integer = False
+    if knob is not False:
+        if core.hasPropertyLimits(device_label, property_name):
+            limits = (
+                core.getPropertyLowerLimit(device_label, property_name),
+                core.getPropertyUpperLimit(device_label, property_name),
+            )
+        is_integer = (
+            core.getPropertyType(device_label, property_name) == PropertyType.Integer
+        )
+    allowed: tuple[str, ...] = ()
+    if knob is not True:
+        allowed = tuple(core.getAllowedPropertyValues(device_label, property_name))
+    return PropertyInfo(
+        value=core.getProperty(device_label, property_name) if value is None else value,
+        limits=limits,
+        allowed=allowed,
+        is_integer=is_integer,
+    )
+
+
+class _Throttled:
+    """Call `func` with the latest value, at most once every `interval` seconds.
+
+    The first call after an idle period is forwarded immediately.  Calls arriving
+    while `func` is running, or less than `interval` seconds after it returned,
+    only replace the pending value, which is then flushed from a helper thread.
+    Intermediate values are dropped, and `func` is never called concurrently (so a
+    slow device never has more than one write in flight).
+    """
+
+    def __init__(self, func: Callable[[float], Any], interval: float) -> None:
+        self._func = func
+        self._interval = interval
+        self._cond = threading.Condition()
+        self._pending: float | None = None
+        self._busy = False  # whether func is running
+        self._ready_at = 0.0  # monotonic time before which func isn't called again
+        self._cancelled = False
+        # flushes pending values; only alive while values keep arriving
+        self._thread: threading.Thread | None = None
+
+    def __call__(self, value: float) -> None:
+        with self._cond:
+            if self._cancelled:
+                return
+            if (
+                self._busy
+                or self._thread is not None
+                or time.monotonic() < self._ready_at
+            ):
+                self._pending = value
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._flush, daemon=True)
+                    self._thread.start()
+                self._cond.notify_all()
+                return
+            self._busy = True
+        self._call(value)
+
+    def _call(self, value: float) -> None:
+        try:
+            self._func(value)
+        finally:
+            with self._cond:
+                self._busy = False
+                self._ready_at = time.monotonic() + self._interval
+                self._cond.notify_all()
+
+    def _flush(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if self._cancelled or (self._pending is None and not self._busy):
+                        self._thread = None
+                        return
+                    delay = self._ready_at - time.monotonic()
+                    if self._pending is not None and not self._busy and delay <= 0:
+                        break
+                    self._cond.wait(None if self._busy else max(delay, 0))
+                value, self._pending = self._pending, None
+                self._busy = True
+            self._call(value)
+
+    def cancel(self) -> None:
+        """Drop the pending value, and stop flushing."""
+        with self._cond:
+            self._cancelled = True
+            self._pending = None
+            self._cond.notify_all()
+
+
+class _PropertyDispatcher:
+    """Route core's propertyChanged events to listeners of a specific property.
+
+    Each core gets a single connection to `propertyChanged`, so an event costs one
+    dict lookup no matter how many MIDI controls are connected.
+    """
+
+    def __init__(self) -> None:
+        self.listeners: defaultdict[tuple[str, str], list[Callable[[str], Any]]] = (
+            defaultdict(list)
+        )
+        self._lock = threading.Lock()
+        self._paused = 0
+        self._pending: dict[tuple[str, str], str] = {}
+
+    def __call__(self, dev: str, prop: str, value: str) -> None:
+        with self._lock:
+            if self._paused:
+                self._pending[(dev, prop)] = value
+                return
+        for callback in tuple(self.listeners.get((dev, prop), ())):
+            callback(value)
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        """Hold events in this context, then deliver the latest value per property."""
+        with self._lock:
+            self._paused += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._paused -= 1
+                pending: dict[tuple[str, str], str] = {}
+                if not self._paused:
+                    pending, self._pending = self._pending, {}
+            for (dev, prop), value in pending.items():
+                self(dev, prop, value)
+
+
+_DISPATCHERS: WeakKeyDictionary[CMMCorePlus, _PropertyDispatcher] = WeakKeyDictionary()
+
+
+def _get_dispatcher(core: CMMCorePlus) -> _PropertyDispatcher:
+    dispatcher = _DISPATCHERS.get(core)
+    if dispatcher is None:
+        dispatcher = _DISPATCHERS[core] = _PropertyDispatcher()
+        core.events.propertyChanged.connect(dispatcher)
+    return dispatcher
+
+
+def paused_property_events(core: CMMCorePlus) -> ContextManager[None]:
+    """Context in which property changes on core are held back from MIDI controls.
+
+    On exit, each control connected to a property that changed receives a single
+    update with the latest value.  Other listeners of core are not affected.
+    """
+    return _get_dispatcher(core).paused()
+
+
+def _connect_property(
+    core: CMMCorePlus,
+    device_label: str,
+    property_name: str,
+    callback: Callable[[str], Any],
+) -> Callable[[], None]:
+    """Call `callback(value)` whenever `device_label.property_name` changes on core.
+
+    Returns a function that can be called to disconnect the callback.
+    """
+    dispatcher = _get_dispatcher(core)
+    key = (device_label, property_name)
+    dispatcher.listeners[key].append(callback)
+
+    def disconnect() -> None:
+        listeners = dispatcher.listeners.get(key, [])
+        if callback in listeners:
+            listeners.remove(callback)
+        if not listeners:
+            dispatcher.listeners.pop(key, None)
+
+    return disconnect
+
 
 def connect_knob_to_property(
-    knob: Knob, core: CMMCorePlus, device_label: str, property_name: str
+    knob: Knob,
+    core: CMMCorePlus,
+    device_label: str,
+    property_name: str,
+    info: PropertyInfo | None = None,
 ) -> Callable[[], None]:
     """Connect a knob to a property controlled by MMCore.
 
@@ -24,13 +250,18 @@ def connect_knob_to_property(
         The label of the device that owns the property
     property_name : str
         The name of the property to connect to
+    info : PropertyInfo | None
+        The current state of the property, if already known. By default, it is read
+        from core.
 
     Returns
     -------
     Callable[[], None]
         A function that can be called to disconnect the knob from the property
     """
-    if not core.hasPropertyLimits(device_label, property_name):
+    if info is None:
+        info = get_property_info(core, device_label, property_name, knob=True)
+    if info.limits is None:
         warnings.warn(
             f"Property {device_label}.{property_name} has no limits and "
             "cannot be connected to a MIDI knob",
@@ -38,47 +269,86 @@ def connect_knob_to_property(
         )
         return lambda: None
 
-    prop_lower = core.getPropertyLowerLimit(device_label, property_name)
-    prop_range = core.getPropertyUpperLimit(device_label, property_name) - prop_lower
-    knob_lower = 0
-    knob_upper = 127
-    knob_range = knob_upper - knob_lower
+    prop_lower, prop_upper = info.limits
+    prop_range = prop_upper - prop_lower
+    knob_range = KNOB_MAX - KNOB_MIN
+    # NOTE: don't precompute the scale factors (e.g. knob_range / prop_range): the
+    # rounding of the product can then map the ends of one range inside the other
+    # (e.g. the upper limit of a (0, 2.7) property to knob 126).
 
     def knob2value(value: float) -> float:
         """Convert value from knob range to property range."""
-        v = (value - knob_lower) / knob_range * prop_range + prop_lower
-        return float(v)
+        return float((value - KNOB_MIN) / knob_range * prop_range + prop_lower)
 
     def value2knob(value: float | str) -> int:
         """Convert value from property range to knob range."""
-        out = (float(value) - prop_lower) / prop_range * knob_range + knob_lower
-        # Make sure the value is in the range [knob_lower, knob_upper]
-        return min(max(int(out), knob_lower), knob_upper)
+        if type(value) is not float:
+            value = float(value)
+        out = int((value - prop_lower) / prop_range * knob_range) + KNOB_MIN
+        # Make sure the value is in the range [KNOB_MIN, KNOB_MAX]
+        return KNOB_MIN if out < KNOB_MIN else KNOB_MAX if out > KNOB_MAX else out
+
+    to_knob = value2knob
+    if info.is_integer and prop_range <= INT_TABLE_MAX_SIZE:
+        # core reports integer values as strings (e.g. "42"): look up the knob value
+        # of each one directly, rather than parsing and rescaling on every event
+        int_table = {
+            str(v): value2knob(float(v))
+            for v in range(int(prop_lower), int(prop_upper) + 1)
+        }
+
+        def int_value2knob(value: float | str) -> int:
+            """Convert value to knob range, using int_table when possible."""
+            out = int_table.get(value) if type(value) is str else None
+            return value2knob(value) if out is None else out
+
+        to_knob = int_value2knob
 
     # set knob value to the current value of the property
-    knob.set_value(value2knob(float(core.getProperty(device_label, property_name))))
+    knob.set_value(to_knob(info.value))
+
+    # set while this knob is writing to core, so that the resulting
+    # propertyChanged event isn't echoed back to the device
+    writing = threading.local()
+
+    def _set_core_value(value: float) -> None:
+        writing.active = True
+        try:
+            core.setProperty(device_label, property_name, knob2value(value))
+        finally:
+            writing.active = False
+
+    # connect knob change events to update core.  A fader sweep can deliver
+    # ~1 message/ms, so only the latest value is sent, at most KNOB_UPDATE_RATE/sec.
+    throttled_set = _Throttled(_set_core_value, 1 / KNOB_UPDATE_RATE)
 
-    # connect knob change events to update core
     @knob.changed.connect
     def _update_core_value(value: float) -> None:
-        core.setProperty(device_label, property_name, knob2value(value))
+        throttled_set(value)
 
     # connect core property change events to update knob
-    def _update_knob_value(dev: str, prop: str, value: str) -> None:
-        if dev == device_label and prop == property_name:
-            knob.set_value(value2knob(value))
+    def _update_knob_value(value: str) -> None:
+        if not getattr(writing, "active", False):
+            knob.set_value(to_knob(value))
 
-    core.events.propertyChanged.connect(_update_knob_value)
+    disconnect_core = _connect_property(
+        core, device_label, property_name, _update_knob_value
+    )
 
     def disconnect() -> None:
         knob.changed.disconnect(_update_core_value)
-        core.events.propertyChanged.disconnect(_update_knob_value)
+        throttled_set.cancel()
+        disconnect_core()
 
     return disconnect
 
 
 def connect_button_to_property(
-    button: Button, core: CMMCorePlus, device_label: str, property_name: str
+    button: Button,
+    core: CMMCorePlus,
+    device_label: str,
+    property_name: str,
+    info: PropertyInfo | None = None,
 ) -> Callable[[], None]:
     """Connect a button to a property controlled by MMCore.
 
@@ -92,16 +362,18 @@ def connect_button_to_property(
         The label of the device that owns the property
     property_name : str
         The name of the property to connect to
+    info : PropertyInfo | None
+        The current state of the property, if already known. By default, it is read
+        from core.
 
     Returns
     -------
     Callable[[], None]
         A function that can be called to disconnect the knob from the property
     """
-    # set knob value to the current value of the property
-    # .set_value(value2knob(float(core.getProperty(device_label, property_name))))
-
-    allowed = core.getAllowedPropertyValues(device_label, property_name)
+    if info is None:
+        info = get_property_info(core, device_label, property_name, knob=False)
+    allowed = info.allowed
     is_bool = set(allowed) == {"0", "1"}
     if not allowed:  # pragma: no cover
         warnings.warn(
@@ -111,31 +383,43 @@ def connect_button_to_property(
         )
         return lambda: None
 
+    # each press cycles to the next allowed value
+    next_values = {v: allowed[(i + 1) % len(allowed)] for i, v in enumerate(allowed)}
+
     def set_button_state(val: Any) -> None:
         if val in ("0", False, 0):
             button.release()  # ensure the button is not highlighted
         elif is_bool:
             button.press()  # keep the button highlighted
 
-    set_button_state(core.getProperty(device_label, property_name))
+    set_button_state(info.value)
+
+    # set while this button is writing to core (see connect_knob_to_property)
+    writing = threading.local()
 
     # connect knob change events to update core
     @button.released.connect
     def _update_core_value() -> None:
         current = core.getProperty(device_label, property_name)
-        next_val = allowed[(allowed.index(current) + 1) % len(allowed)]
-        core.setProperty(device_label, property_name, next_val)
+        next_val = next_values.get(current, allowed[0])
+        writing.active = True
+        try:
+            core.setProperty(device_label, property_name, next_val)
+        finally:
+            writing.active = False
         set_button_state(next_val)
 
-    # connect core property change events to update knob
-    def _update_button_value(dev: str, prop: str, value: str) -> None:
-        if dev == device_label and prop == property_name:
+    # connect core property change events to update button
+    def _update_button_value(value: str) -> None:
+        if not getattr(writing, "active", False):
             set_button_state(value)
 
-    core.events.propertyChanged.connect(_update_button_value)
+    disconnect_core = _connect_property(
+        core, device_label, property_name, _update_button_value
+    )
 
     def disconnect() -> None:
         button.released.disconnect(_update_core_value)
-        core.events.propertyChanged.disconnect(_update_button_value)
+        disconnect_core()
 
     return disconnect
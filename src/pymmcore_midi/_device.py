@@ -1,7 +1,27 @@
 from __future__ import annotations
 
+import inspect
+import logging
 import os
-from typing import TYPE_CHECKING, ClassVar, Iterable, Iterator, Mapping, TypeVar
+import threading
+import warnings
+import weakref
+from array import array
+from collections import deque
+from types import MappingProxyType
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    ClassVar,
+    ItemsView,
+    Iterable,
+    Iterator,
+    KeysView,
+    Mapping,
+    TypeVar,
+    ValuesView,
+)
 
 import mido
 import mido.backends
@@ -12,13 +32,91 @@ if TYPE_CHECKING:
 
 
 T = TypeVar("T")
+C = TypeVar("C", bound=Callable[..., Any])
 DEBUG = os.getenv("PYMMCORE_MIDI_DEBUG", "0") == "1"
+logger = logging.getLogger(__name__)
+
+
+# status bytes (upper nibble) of the channel messages we send
+NOTE_OFF = 0x80
+NOTE_ON = 0x90
+CONTROL_CHANGE = 0xB0
+# mido's default note velocity
+VELOCITY = 64
+# state of a knob/button whose value on the device is not known
+UNKNOWN = -1
+
+
+def _knob_state_buffer() -> array[int]:
+    """Return a buffer for the state of all 128 MIDI controls."""
+    return array("b", [UNKNOWN] * 128)
+
+
+def _raw_sender(output: mido.ports.BaseOutput) -> Callable[..., None]:
+    """Return a function that sends raw MIDI messages (bytes) to `output`.
+
+    With mido's rtmidi backend the bytes are passed straight to rtmidi, skipping
+    `mido.Message` construction and validation.  Other ports (or versions of mido
+    that don't have the expected private attributes) are sent a message built from
+    the bytes.  Several messages may be passed at once.
+    """
+    rt = getattr(output, "_rt", None)
+    lock = getattr(output, "_send_lock", None)
+    if (
+        type(output).__module__ == "mido.backends.rtmidi"
+        and rt is not None
+        and lock is not None
+    ):
+
+        def send(*messages: bytes) -> None:
+            with lock:
+                # same check as mido's BaseOutput.send
+                if output.closed:
+                    raise ValueError("send() called on closed port")
+                for data in messages:
+                    rt.send_message(data)
+
+        return send
+
+    def send_fallback(*messages: bytes) -> None:
+        for data in messages:
+            output.send(mido.Message.from_bytes(data))
+
+    return send_fallback
+
+
+def _pump(
+    ref: weakref.ReferenceType[MidiDevice],
+    rx: deque[mido.Message | int | threading.Event],
+    ready: threading.Event,
+) -> None:
+    """Dispatch queued messages until the device is closed or collected.
+
+    This is the target of the worker thread of each MidiDevice.
+    """
+    while True:
+        ready.wait()
+        ready.clear()
+        device = ref()
+        if device is None or device._closed:
+            # release anyone still waiting in `join`
+            for item in rx:
+                if isinstance(item, threading.Event):
+                    item.set()
+            return
+        try:
+            device._drain()
+        except Exception:  # pragma: no cover
+            logger.exception("Error dispatching MIDI messages")
+        del device
 
 
 # just a read-only mapping
 class _Map(Mapping[int, T]):
     def __init__(self, data: Mapping[int, T]) -> None:
-        self._data = data
+        # the Mapping mixin methods are implemented in Python on top of
+        # __getitem__/__iter__, so delegate them all to the (C-level) mappingproxy
+        self._data = MappingProxyType(dict(data))
 
     def __getitem__(self, key: int) -> T:
         return self._data[key]
@@ -30,50 +128,158 @@ class _Map(Mapping[int, T]):
         return len(self._data)
 
     def __repr__(self) -> str:
-        return repr(self._data)
+        return repr(dict(self._data))
 
     def __contains__(self, key: object) -> bool:
         return key in self._data
 
+    def keys(self) -> KeysView[int]:
+        return self._data.keys()
+
+    def values(self) -> ValuesView[T]:
+        return self._data.values()
+
+    def items(self) -> ItemsView[int, T]:
+        return self._data.items()
+
+
+def _max_args(callback: Callable[..., Any]) -> int | None:
+    """Return the number of positional args `callback` accepts (None if unlimited)."""
+    try:
+        params = inspect.signature(callback).parameters.values()
+    except (TypeError, ValueError):  # pragma: no cover
+        return None  # no signature (e.g. some builtins): pass all the arguments
+    n = 0
+    for param in params:
+        if param.kind == param.VAR_POSITIONAL:
+            return None
+        if param.kind in (param.POSITIONAL_ONLY, param.POSITIONAL_OR_KEYWORD):
+            n += 1
+    return n
+
+
+class _Callbacks:
+    """A minimal signal: callbacks that are called with the emitted arguments.
+
+    Used for the events of individual knobs/buttons, which are emitted for every
+    incoming message and don't need psygnal's features (weak references, etc...).
+    Like psygnal, callbacks that accept fewer arguments than are emitted are called
+    with only as many (leading) arguments as they accept.
+    """
+
+    __slots__ = ("_callbacks",)
+
+    def __init__(self) -> None:
+        # (callback, max number of args) pairs.  Replaced (never mutated) on
+        # connect/disconnect, so that emit can iterate without a lock while another
+        # thread (dis)connects
+        self._callbacks: tuple[tuple[Callable[..., Any], int | None], ...] = ()
+
+    def connect(self, callback: C) -> C:
+        """Connect `callback` (returned, so this may be used as a decorator)."""
+        self._callbacks = (*self._callbacks, (callback, _max_args(callback)))
+        return callback
+
+    def disconnect(self, callback: Callable[..., Any]) -> None:
+        """Disconnect `callback`, if it is connected."""
+        self._callbacks = tuple(cb for cb in self._callbacks if cb[0] != callback)
+
+    def emit(self, *args: Any) -> None:
+        """Call all connected callbacks with `args`."""
+        for callback, max_args in self._callbacks:
+            if max_args is None or max_args >= len(args):
+                callback(*args)
+            else:
+                callback(*args[:max_args])
+
+    def __len__(self) -> int:
+        return len(self._callbacks)
+
 
 class Button:
     """A button on a midi device."""
 
-    pressed = Signal()
-    released = Signal()
+    __slots__ = (
+        "_channel",
+        "_note",
+        "_off",
+        "_on",
+        "_output",
+        "_send",
+        "_state",
+        "pressed",
+        "released",
+    )
 
     def __init__(self, note: int, output: mido.ports.BaseOutput, channel: int = 10):
+        self.pressed = _Callbacks()
+        self.released = _Callbacks()
         self._note = note
         self._channel = channel
         self._output = output
+        self._send = _raw_sender(output)
+        # the messages sent by this button never change, so build them once
+        self._on = bytes((NOTE_ON | channel, note, VELOCITY))
+        self._off = bytes((NOTE_OFF | channel, note, VELOCITY))
+        # last state sent to or received from the device (1 = pressed)
+        self._state = UNKNOWN
 
     def press(self) -> None:
-        """Send a note_on message."""
-        msg = mido.Message("note_on", channel=self._channel, note=self._note)
-        self._output.send(msg)
+        """Send a note_on message (unless the button is already pressed)."""
+        if self._state != 1:
+            self._send(self._on)
+            self._state = 1
 
     def release(self) -> None:
-        """Send a note_off message."""
-        msg = mido.Message("note_off", channel=self._channel, note=self._note)
-        self._output.send(msg)
+        """Send a note_off message (unless the button is already released)."""
+        if self._state != 0:
+            self._send(self._off)
+            self._state = 0
 
 
 class Knob:
     """A knob/slider on a midi device."""
 
-    changed = Signal(float)
+    __slots__ = (
+        "_channel",
+        "_control",
+        "_output",
+        "_prefix",
+        "_send",
+        "_values",
+        "changed",
+    )
 
-    def __init__(self, control: int, output: mido.ports.BaseOutput, channel: int = 10):
+    def __init__(
+        self,
+        control: int,
+        output: mido.ports.BaseOutput,
+        channel: int = 10,
+        values: array[int] | None = None,
+    ):
+        self.changed = _Callbacks()
         self._control = control
         self._channel = channel
         self._output = output
+        self._send = _raw_sender(output)
+        self._prefix = bytes((CONTROL_CHANGE | channel, control))
+        # state buffer indexed by control number (usually shared by all the knobs
+        # of a device)
+        self._values = _knob_state_buffer() if values is None else values
+
+    @property
+    def value(self) -> int:
+        """The last value sent to or received from this knob (-1 if unknown)."""
+        return self._values[self._control]
 
     def set_value(self, val: float) -> None:
-        """Send a control_change message."""
-        msg = mido.Message(
-            "control_change", channel=self._channel, control=self._control, value=val
-        )
-        self._output.send(msg)
+        """Send a control_change message (unless the knob already has this value)."""
+        value = int(val)
+        if not 0 <= value <= 127:
+            raise ValueError(f"Knob value must be in range 0..127, not {val!r}")
+        if value != self._values[self._control]:
+            self._send(self._prefix + bytes((value,)))
+            self._values[self._control] = value
 
     def __repr__(self) -> str:
         return f"Knob({self._control!r})"
@@ -82,29 +288,27 @@ class Knob:
 class Buttons(_Map[Button]):
     """A group of buttons. Allows connecting to any button change."""
 
-    pressed = Signal(str)
-    released = Signal(str)
+    pressed = Signal(int)
+    released = Signal(int)
 
     def __init__(
         self, button_ids: Iterable[int], output: mido.ports.BaseOutput
     ) -> None:
         super().__init__({x: Button(x, output) for x in button_ids})
-        # connect to any button press/release
-        for k, v in self.items():
-            v.pressed.connect(lambda k=k: self.pressed.emit(k))
-            v.released.connect(lambda k=k: self.released.emit(k))
 
 
 class Knobs(_Map[Knob]):
     """A group of knobs. Allows connecting to any knob change."""
 
-    changed = Signal(str, float)
+    changed = Signal(int, float)
 
-    def __init__(self, knob_ids: Iterable[int], output: mido.ports.BaseOutput) -> None:
-        super().__init__({x: Knob(x, output) for x in knob_ids})
-        # connect to any knob change
-        for k, v in self.items():
-            v.changed.connect(lambda value, k=k: self.changed.emit(k, value))
+    def __init__(
+        self,
+        knob_ids: Iterable[int],
+        output: mido.ports.BaseOutput,
+        values: array[int] | None = None,
+    ) -> None:
+        super().__init__({x: Knob(x, output, values=values) for x in knob_ids})
 
 
 class MidiDevice:
@@ -122,12 +326,33 @@ class MidiDevice:
 
     DEVICE_NAME: ClassVar[str]
 
+    # emitted for every incoming message with (message_type, note/control, value)
+    event = Signal(str, int, int)
+
+    # subclasses that declare a DEVICE_NAME, by device name
+    _REGISTRY: ClassVar[dict[str, type[MidiDevice]]] = {}
+
+    def __init_subclass__(cls, **kwargs: Any) -> None:
+        super().__init_subclass__(**kwargs)
+        if "DEVICE_NAME" in cls.__dict__:
+            registered = MidiDevice._REGISTRY.setdefault(cls.DEVICE_NAME, cls)
+            if registered is not cls:
+                warnings.warn(
+                    f"{cls.__name__} not registered: {registered.__name__} is "
+                    f"already implemented for device_name: {cls.DEVICE_NAME!r}",
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+
     @classmethod
     def from_name(cls, device_name: str) -> Self:
-        for subcls in cls.__subclasses__():
-            if getattr(subcls, "DEVICE_NAME", None) == device_name:
-                return subcls()  # type: ignore
-        raise KeyError(f"No Subclass implemented for device_name: {device_name!r}")
+        subcls = MidiDevice._REGISTRY.get(device_name)
+        if subcls is None or not issubclass(subcls, cls):
+            raise KeyError(
+                f"No Subclass of {cls.__name__} implemented for device_name: "
+                f"{device_name!r}"
+            )
+        return subcls()  # type: ignore
 
     def __init__(
         self,
@@ -144,12 +369,45 @@ class MidiDevice:
                 f"Could not open input device {device_name!r}. "
                 f"Available device names are: {set(mido.get_input_names())}"
             ) from e
-        self._input.callback = self._on_msg
 
         self.device_name = device_name
         self._buttons = Buttons(button_ids, self._output)
-        self._knobs = Knobs(knob_ids, self._output)
+        self._knob_values = _knob_state_buffer()
+        self._knobs = Knobs(knob_ids, self._output, self._knob_values)
         self._debug = debug
+        self._send = _raw_sender(self._output)
+        self._reset_messages = tuple(
+            [knob._prefix + b"\x00" for knob in self._knobs.values()]
+            + [button._off for button in self._buttons.values()]
+        )
+        self._handlers: dict[str, Callable[[mido.Message], None]] = {
+            "control_change": self._handle_control_change,
+            "note_on": self._handle_note_on,
+            "note_off": self._handle_note_off,
+        }
+
+        # Incoming messages are queued by the mido callback (which runs on the
+        # rtmidi thread) and dispatched to listeners on a dedicated worker thread,
+        # so that slow slots never stall the reception of subsequent messages.
+        # The queue is unbounded: note events and `join` markers must never be dropped.
+        # Control changes are queued as a control id (once) with the newest message
+        # of that control in `_cc_pending`, so a fader sweep takes a single item.
+        self._rx: deque[mido.Message | int | threading.Event] = deque()
+        self._cc_pending: dict[int, mido.Message] = {}
+        self._rx_lock = threading.Lock()
+        self._rx_ready = threading.Event()
+        self._closed = False
+        # the worker only holds a weak reference to the device, so that a device that
+        # is never closed can still be garbage collected (which stops the worker)
+        self._rx_thread = threading.Thread(
+            target=_pump,
+            args=(weakref.ref(self), self._rx, self._rx_ready),
+            name=f"{device_name} MIDI input",
+            daemon=True,
+        )
+        self._rx_thread.start()
+        weakref.finalize(self, self._rx_ready.set)
+        self._input.callback = self._on_msg
 
     @property
     def knob(self) -> Knobs:
@@ -179,20 +437,141 @@ class MidiDevice:
         """Close the midi device."""
         self._input.close()
         self._output.close()
+        self._closed = True
+        self._rx_ready.set()
+        if threading.current_thread() is not self._rx_thread:
+            self._rx_thread.join()
+
+    def join(self, timeout: float | None = None) -> bool:
+        """Block until all messages received so far have been dispatched.
+
+        Parameters
+        ----------
+        timeout : float | None
+            Maximum time to wait, in seconds. By default, wait indefinitely.
+
+        Returns
+        -------
+        bool
+            False if the timeout elapsed before the messages were dispatched.
+        """
+        if self._closed or threading.current_thread() is self._rx_thread:
+            return True
+        done = threading.Event()
+        self._rx.append(done)
+        self._rx_ready.set()
+        return done.wait(timeout)
+
+    def feed(self, messages: Iterable[mido.Message]) -> None:
+        """Handle `messages` as if they had been received from the device.
+
+        Unlike messages received from the device, these are dispatched to listeners
+        synchronously, on the calling thread, and errors raised by listeners are not
+        caught.
+
+        Parameters
+        ----------
+        messages : Iterable[mido.Message]
+            The messages to handle, in order.
+        """
+        for message in messages:
+            self._update_state(message)
+            self._dispatch(message)
+
+    def _update_state(self, message: mido.Message) -> None:
+        """Keep track of the state of the device (even if nobody is listening)."""
+        kind = message.type
+        if kind == "control_change":
+            self._knob_values[message.control] = message.value
+        elif kind == "note_on" or kind == "note_off":
+            button = self._buttons._data.get(message.note)
+            if button is not None:
+                button._state = int(kind == "note_on")
 
     def _on_msg(self, message: mido.Message) -> None:
+        # called on the mido/rtmidi thread: queue the message and return immediately
+        self._update_state(message)
+        # most controls of a device are usually unused: don't even queue messages
+        # that wouldn't reach any listener.
+        if self._debug or self._has_listeners(message):
+            if message.type == "control_change":
+                # only the newest value of a control matters: replace the pending
+                # message of this control, and queue the control if it isn't already
+                with self._rx_lock:
+                    if message.control not in self._cc_pending:
+                        self._rx.append(message.control)
+                    self._cc_pending[message.control] = message
+            else:
+                self._rx.append(message)
+            self._rx_ready.set()
+
+    def _has_listeners(self, message: mido.Message) -> bool:
+        """Return True if any signal that `message` would emit has a connection."""
+        if len(self.event):
+            return True
+        kind = message.type
+        if kind == "control_change":
+            knob = self._knobs._data.get(message.control)
+            # let unknown controls through, so that the error is reported
+            return knob is None or bool(len(self._knobs.changed) or len(knob.changed))
+        if kind == "note_on" or kind == "note_off":
+            button = self._buttons._data.get(message.note)
+            if button is None:
+                return True
+            if kind == "note_on":
+                return bool(len(self._buttons.pressed) or len(button.pressed))
+            return bool(len(self._buttons.released) or len(button.released))
+        return False
+
+    def _drain(self) -> None:
+        rx = self._rx
+        pending = self._cc_pending
+        while rx:
+            item = rx.popleft()
+            if isinstance(item, threading.Event):
+                item.set()  # marker from `join`
+                continue
+            if isinstance(item, int):
+                with self._rx_lock:
+                    item = pending.pop(item)
+            try:
+                self._dispatch(item)
+            except Exception:
+                # a failing listener must not stop the dispatch of other messages
+                logger.exception("Error handling MIDI message %s", item)
+
+    def _dispatch(self, message: mido.Message) -> None:
         if self._debug:
             print(self.device_name, message)
-        if message.type == "control_change":
-            self._knobs[message.control].changed.emit(message.value)
-        elif message.type == "note_on":
-            self._buttons[message.note].pressed.emit()
-        elif message.type == "note_off":
-            self._buttons[message.note].released.emit()
+        handler = self._handlers.get(message.type)
+        if handler is not None:
+            handler(message)
+
+    def _handle_control_change(self, message: mido.Message) -> None:
+        control, value = message.control, message.value
+        # index the mappingproxy directly, skipping _Map.__getitem__
+        knob = self._knobs._data[control]
+        self.event.emit("control_change", control, value)
+        knob.changed.emit(value)
+        self._knobs.changed.emit(control, value)
+
+    def _handle_note_on(self, message: mido.Message) -> None:
+        button = self._buttons._data[message.note]
+        self.event.emit("note_on", message.note, message.velocity)
+        button.pressed.emit()
+        self._buttons.pressed.emit(message.note)
+
+    def _handle_note_off(self, message: mido.Message) -> None:
+        button = self._buttons._data[message.note]
+        self.event.emit("note_off", message.note, message.velocity)
+        button.released.emit()
+        self._buttons.released.emit(message.note)
 
     def reset(self) -> None:
         """Set all knobs/sliders to 0 and make sure buttons are unpressed."""
-        for knob in self._knobs.values():
-            knob.set_value(0)
+        # send everything in one go, regardless of the known state of the device
+        self._send(*self._reset_messages)
+        for control in self._knobs:
+            self._knob_values[control] = 0
         for button in self._buttons.values():
-            button.release()
+            button._state = 0
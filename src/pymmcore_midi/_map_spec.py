@@ -3,8 +3,9 @@ from __future__ import annotations
 import contextlib
 import json
 from dataclasses import asdict, dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import TYPE_CHECKING, Callable, Literal, Sequence
+from typing import TYPE_CHECKING, Any, Callable, Literal, Sequence
 
 from pymmcore_plus import CMMCorePlus
 
@@ -15,6 +16,8 @@ from ._device import MidiDevice
 if TYPE_CHECKING:
     from pymmcore_midi import Knob
 
+    from ._core_connect import PropertyInfo
+
 MsgType = Literal["note_on", "note_off", "control_change"]
 VALID_MESSAGE_TYPES = {"note_on", "note_off", "control_change", "button", "knob"}
 TYPE_ALIASES: dict[str, MsgType] = {
@@ -25,7 +28,7 @@ TYPE_ALIASES: dict[str, MsgType] = {
 
 
 @dataclass
-class Mapping:
+class Binding:
     message_type: MsgType
     control_id: int
     device_label: str | None = None
@@ -54,11 +57,17 @@ class Mapping:
         else:
             return device.button[self.control_id]
 
-    def connect_device_to_core(self, device: MidiDevice, core: CMMCorePlus) -> Callable:
+    def connect_device_to_core(
+        self,
+        device: MidiDevice,
+        core: CMMCorePlus,
+        info: PropertyInfo | None = None,
+    ) -> Callable:
         """Connect device to core.
 
         This makes the connection between an individual knob/button on device, and a
-        specific device property on core.
+        specific device property on core.  `info` may be provided to avoid reading the
+        current state of the property from core.
         """
         from ._core_connect import connect_button_to_property, connect_knob_to_property
 
@@ -76,7 +85,7 @@ class Mapping:
                 # NOTE: connecting a callback to a knob may be a bad idea
                 # without checking the method signature?
                 signal = midi_obj.changed
-            signal.connect(method, check_nargs=False)
+            signal.connect(method)
             return lambda: signal.disconnect(method)
 
         else:
@@ -85,30 +94,56 @@ class Mapping:
             else:
                 func = connect_button_to_property
 
-            return func(midi_obj, core, self.device_label, self.property_name)
+            return func(midi_obj, core, self.device_label, self.property_name, info)
 
     @classmethod
-    def from_obj(cls, obj: Mapping | dict | Sequence[str]) -> Mapping:
-        """Initialize Mapping from an object."""
-        if isinstance(obj, Mapping):
+    def from_obj(cls, obj: Binding | dict | Sequence[str]) -> Binding:
+        """Initialize Binding from an object."""
+        if isinstance(obj, Binding):
             obj = asdict(obj)  # pragma: no cover
         if isinstance(obj, dict):
             return cls(**obj)
         elif isinstance(obj, (list, tuple)):
             return cls(*obj)
         raise TypeError(  # pragma: no cover
-            "Mapping.from_obj() requires a Mapping, dict, or tuple, not "
+            "Binding.from_obj() requires a Binding, dict, or tuple, not "
             f"{type(obj).__name__}"
         )
 
 
+@lru_cache(maxsize=32)
+def _parse_spec(data: bytes, fmt: Literal["json", "yaml"]) -> dict[str, Any]:
+    """Parse the contents of a json or yaml spec file.
+
+    Results are cached by file contents, so reading the same spec again skips the
+    parser. The returned dict must not be modified.
+    """
+    if fmt == "json":
+        try:
+            import orjson  # type: ignore[import-not-found,unused-ignore]
+
+            loads: Callable[[bytes], Any] = orjson.loads
+        except ImportError:
+            loads = json.loads
+        return loads(data)  # type: ignore [no-any-return]
+
+    try:
+        import yaml  # type: ignore
+    except ImportError as e:
+        raise ImportError("You must install pyyaml to use yaml files.") from e
+
+    # use the libyaml C loader when pyyaml was built with it
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(data, Loader=loader)  # type: ignore [no-any-return]
+
+
 @dataclass
 class DeviceMap:
     device_name: str
-    mappings: list[Mapping]
+    mappings: list[Binding]
 
     def __post_init__(self) -> None:
-        self.mappings = [Mapping.from_obj(m) for m in self.mappings]
+        self.mappings = [Binding.from_obj(m) for m in self.mappings]
 
     @classmethod
     def from_file(cls, path: str | Path) -> DeviceMap:
@@ -116,19 +151,16 @@ class DeviceMap:
 
         Must be json or yaml.
         """
-        data = Path(path).read_bytes()
         if str(path).endswith(".json"):
-            return cls(**json.loads(data))
+            fmt = "json"
         elif str(path).endswith((".yaml", ".yml")):
-            try:
-                import yaml  # type: ignore
-            except ImportError as e:
-                raise ImportError("You must install pyyaml to use yaml files.") from e
-
-            return cls(**yaml.safe_load(data))
-        raise ValueError(  # pragma: no cover
-            f"File type not recognized. Must be .json, .yaml, or .yml, not {path!r}"
-        )
+            fmt = "yaml"
+        else:
+            raise ValueError(  # pragma: no cover
+                f"File type not recognized. Must be .json, .yaml, or .yml, not {path!r}"
+            )
+        # a new DeviceMap (with new Bindings) is built from the (shared) parsed data
+        return cls(**_parse_spec(Path(path).read_bytes(), fmt))
 
     def connect_to_core(
         self, core: CMMCorePlus | None = None, device: MidiDevice | None = None
@@ -137,9 +169,17 @@ class DeviceMap:
 
         Returns a function that can be called to disconnect the device from core.
         """
+        from ._core_connect import paused_property_events
+
         device = device or MidiDevice.from_name(self.device_name)
         core = core or CMMCorePlus.instance()
-        disconnecters = [m.connect_device_to_core(device, core) for m in self.mappings]
+        # property changes that happen while connecting (and may not be reflected in
+        # the prefetched state) are delivered once, after everything is connected
+        with paused_property_events(core):
+            disconnecters = [
+                m.connect_device_to_core(device, core, info)
+                for m, info in zip(self.mappings, self._prefetch(core))
+            ]
 
         def disconnect() -> None:
             for d in disconnecters:
@@ -147,3 +187,26 @@ class DeviceMap:
                     d()
 
         return disconnect
+
+    def _prefetch(self, core: CMMCorePlus) -> list[PropertyInfo | None]:
+        """Read the state of the property of each mapping from core.
+
+        Current values are taken from the system state cache, rather than read from
+        the devices.  Returns None for mappings that don't target a property.
+        """
+        from ._core_connect import get_property_info
+
+        infos: dict[tuple[str, str, bool], PropertyInfo] = {}
+        result: list[PropertyInfo | None] = []
+        for m in self.mappings:
+            if m.device_label is None or m.property_name is None:
+                result.append(None)
+                continue
+            key = (m.device_label, m.property_name, m.message_type == "control_change")
+            if key not in infos:
+                value: str | None = None
+                with contextlib.suppress(RuntimeError):  # not in the cache
+                    value = core.getPropertyFromCache(*key[:2])
+                infos[key] = get_property_info(core, *key[:2], value, knob=key[2])
+            result.append(infos[key])
+        return result
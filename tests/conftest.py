@@ -1,11 +1,40 @@
+from functools import lru_cache
+from typing import Any, Iterator, Tuple
 from unittest.mock import MagicMock
 
 import mido
 import pytest
+from pymmcore_plus import CMMCorePlus
 
 
-@pytest.fixture
-def mock_xtouch(monkeypatch: pytest.MonkeyPatch) -> None:
+@lru_cache(maxsize=None)
+def note_on(note: int, velocity: int = 64) -> mido.Message:
+    """A (cached) note_on message on the X-Touch Mini's channel."""
+    return mido.Message("note_on", channel=10, note=note, velocity=velocity)
+
+
+@lru_cache(maxsize=None)
+def note_off(note: int, velocity: int = 64) -> mido.Message:
+    """A (cached) note_off message on the X-Touch Mini's channel."""
+    return mido.Message("note_off", channel=10, note=note, velocity=velocity)
+
+
+@lru_cache(maxsize=None)
+def cc(control: int, value: int) -> mido.Message:
+    """A (cached) control_change message on the X-Touch Mini's channel."""
+    return mido.Message("control_change", channel=10, control=control, value=value)
+
+
+class Capture(list):
+    """A callback that records the arguments of each call (a lightweight mock)."""
+
+    def __call__(self, *args: Any) -> None:
+        self.append(args)
+
+
+@pytest.fixture(scope="session")
+def _patched_mido() -> Iterator[Tuple[MagicMock, MagicMock]]:
+    # patch mido once per session: mock_xtouch only resets the mocks
     mock_in = MagicMock()
     mock_out = MagicMock()
 
@@ -17,7 +46,47 @@ def mock_xtouch(monkeypatch: pytest.MonkeyPatch) -> None:
         if device_name == "X-TOUCH MINI":
             return mock_out
 
-    monkeypatch.setattr(mido, "open_input", _mock_open_input)
-    monkeypatch.setattr(mido, "open_output", _mock_open_output)
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(mido, "open_input", _mock_open_input)
+        mp.setattr(mido, "open_output", _mock_open_output)
+        yield mock_in, mock_out
 
+
+@pytest.fixture
+def mock_xtouch(
+    _patched_mido: Tuple[MagicMock, MagicMock],
+) -> Iterator[Tuple[MagicMock, MagicMock]]:
+    mock_in, mock_out = _patched_mido
+    mock_in.reset_mock()
+    mock_out.reset_mock()
+    # the port's callback is a bound method, which would keep the last device alive
+    mock_in.callback = None
     yield mock_in, mock_out
+    mock_in.callback = None
+
+
+@pytest.fixture(scope="module")
+def _demo_core() -> Iterator[CMMCorePlus]:
+    # loading the demo configuration is by far the slowest step in the test suite,
+    # so it is done once per module
+    core = CMMCorePlus()
+    core.loadSystemConfiguration()
+    yield core
+    core.reset()
+
+
+@pytest.fixture
+def loaded_core(_demo_core: CMMCorePlus) -> Iterator[CMMCorePlus]:
+    """A core with the demo configuration loaded.
+
+    Property values changed by the test are restored afterwards.
+    """
+    state = _demo_core.getSystemState()
+    yield _demo_core
+    _demo_core.setSystemState(state)
+
+
+@pytest.fixture(scope="module")
+def unloaded_core() -> CMMCorePlus:
+    """A core without any devices loaded."""
+    return CMMCorePlus()
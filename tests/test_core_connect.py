@@ -1,67 +1,285 @@
+import threading
+import time
 from pathlib import Path
+from typing import Callable, Dict, Tuple
 from unittest.mock import Mock, call
 
-import mido
 import pytest
+from conftest import Capture, cc, note_on
 from pymmcore_plus import CMMCorePlus
 
-from pymmcore_midi import DeviceMap, XTouchMini, connect_knob_to_property
-
-YAML = """
-device_name: X-TOUCH MINI
-mappings:
-  - [button, 8, Camera, AllowMultiROI]
-  - [button, 9, Camera, Binning]
-  - [knob, 2, Camera, Gain]
-  - [knob, 9, Camera, CCDTemperature]
-  - message_type: control_change
-    control_id: 1
-    device_label: Camera
-    property_name: Exposure
-  - message_type: button
-    control_id: 10
-    core_method: snap
-  - message_type: knob
-    control_id: 17
-    core_method: setAutoFocusOffset
-"""
-
-
-def test_core_connect(mock_xtouch, tmp_path: Path) -> None:
-    (spec := tmp_path / "spec.yaml").write_text(YAML)
-    dev_map = DeviceMap.from_file(spec)
+from pymmcore_midi import (
+    DeviceMap,
+    XTouchMini,
+    connect_button_to_property,
+    connect_knob_to_property,
+)
+from pymmcore_midi._core_connect import (
+    PropertyInfo,
+    _connect_property,
+    _get_dispatcher,
+    _Throttled,
+    paused_property_events,
+)
+
+SPEC = Path(__file__).parent / "data" / "xtouch_spec.yaml"
+# the same mappings as SPEC, declared in code
+MAPPINGS = [
+    ("button", 8, "Camera", "AllowMultiROI"),
+    ("button", 9, "Camera", "Binning"),
+    ("knob", 2, "Camera", "Gain"),
+    ("knob", 9, "Camera", "CCDTemperature"),
+    {
+        "message_type": "control_change",
+        "control_id": 1,
+        "device_label": "Camera",
+        "property_name": "Exposure",
+    },
+    {"message_type": "button", "control_id": 10, "core_method": "snap"},
+    {"message_type": "knob", "control_id": 17, "core_method": "setAutoFocusOffset"},
+]
+
+
+GAIN = ("Camera", "Gain")
+BINNING = ("Camera", "Binning")
+
+
+def _snapshot(core: CMMCorePlus, *props: Tuple[str, str]) -> Dict[Tuple[str, str], str]:
+    """Read the value of several properties from the system state cache."""
+    return {(d, p): core.getPropertyFromCache(d, p) for d, p in props}
+
+
+def _from_yaml() -> DeviceMap:
+    return DeviceMap.from_file(SPEC)
+
+
+def _from_list() -> DeviceMap:
+    return DeviceMap("X-TOUCH MINI", MAPPINGS)
+
+
+@pytest.mark.parametrize("make_map", [_from_yaml, _from_list], ids=["yaml", "list"])
+def test_core_connect(
+    make_map: Callable[[], DeviceMap],
+    mock_xtouch,
+    loaded_core: CMMCorePlus,
+    unloaded_core: CMMCorePlus,
+) -> None:
+    dev_map = make_map()
     assert dev_map.device_name == "X-TOUCH MINI"
 
-    mock_in, mock_out = mock_xtouch
+    _, mock_out = mock_xtouch
     device = XTouchMini()
 
-    core = CMMCorePlus.instance()
     with pytest.raises(RuntimeError, match='No device with label "Camera"'):
-        dev_map.connect_to_core(core, device)
+        dev_map.connect_to_core(unloaded_core, device)
 
-    core.loadSystemConfiguration()
+    core = loaded_core
     core.setProperty("Camera", "AllowMultiROI", 1)  # show that it highlights the button
     disconnect = dev_map.connect_to_core(core, device)
 
     # button value was set during connection
-    msg = mido.Message("note_on", channel=10, note=8, velocity=64, time=0)
-    assert call(msg) in mock_out.send.call_args_list
+    sent = {tuple(args[0].bytes()) for args, _ in mock_out.send.call_args_list}
+    assert tuple(note_on(8).bytes()) in sent
 
     with pytest.warns(match="has no limits"):
         connect_knob_to_property(device.knob[3], core, "Camera", "TestProperty5")
 
-    mock = Mock()
-    device.knob[2].changed.connect(mock)
-    msg = mido.Message("control_change", channel=10, control=4, value=127, time=0)
-    mock_in.callback(msg)
-
+    assert _snapshot(core, BINNING) == {BINNING: "1"}
     # turn knob
     device.knob[2].changed.emit(127)
-    assert core.getProperty("Camera", "Gain") == "8"
-
     # click button
-    assert core.getProperty("Camera", "Binning") == "1"
     device.button[9].released.emit()
-    assert core.getProperty("Camera", "Binning") == "2"
+    assert _snapshot(core, GAIN, BINNING) == {GAIN: "8", BINNING: "2"}
+
+    disconnect()
+
+
+def test_mapping_deprecated() -> None:
+    import pymmcore_midi
+
+    with pytest.warns(DeprecationWarning, match="use pymmcore_midi.Binding"):
+        assert pymmcore_midi.Mapping is pymmcore_midi.Binding
+
+
+@pytest.mark.parametrize(
+    "upper, is_integer",
+    [(1.7, False), (2.7, False), (3.3, False), (5.4, False), (23, True), (46, True)],
+)
+def test_knob_range_endpoints(mock_xtouch, upper: float, is_integer: bool) -> None:
+    """Test that the limits of a property map to the ends of the knob range."""
+    core = Mock()
+    device = XTouchMini()
+    knob = device.knob[1]
+    for value, expected in (("0", 0), (str(upper), 127)):
+        info = PropertyInfo(value, (0, upper), (), is_integer)
+        disconnect = connect_knob_to_property(knob, core, "Camera", "Gain", info)
+        assert knob.value == expected
+        disconnect()
+    device.close()
+
+
+def test_knob_ignores_own_writes(mock_xtouch) -> None:
+    """Test that the property change caused by a knob isn't echoed to the device."""
+    _, mock_out = mock_xtouch
+    core = Mock()
+    dispatcher = _get_dispatcher(core)
+    # like CMMCorePlus, emit propertyChanged from within setProperty
+    core.setProperty.side_effect = lambda dev, prop, v: dispatcher(dev, prop, str(v))
+    device = XTouchMini()
+    info = PropertyInfo("0", (0, 127), ())
+    disconnect = connect_knob_to_property(device.knob[1], core, *GAIN, info)
+    mock_out.send.reset_mock()
+
+    # the knob's own write (which doesn't update its state) doesn't send MIDI
+    device.knob[1].changed.emit(64)
+    core.setProperty.assert_called_once_with(*GAIN, 64.0)
+    mock_out.send.assert_not_called()
+
+    # a change from another source does
+    dispatcher(*GAIN, "32")
+    mock_out.send.assert_called_once_with(cc(1, 32))
+    disconnect()
+    device.close()
 
+
+def test_knob_updates_throttled(mock_xtouch) -> None:
+    core = Mock()
+    core.hasPropertyLimits.return_value = True
+    core.getPropertyLowerLimit.return_value = 0
+    core.getPropertyUpperLimit.return_value = 127
+    core.getProperty.return_value = "0"
+    core.getAllowedPropertyValues.return_value = ()
+    flushed = threading.Event()
+    core.setProperty.side_effect = lambda dev, prop, v: v == 127 and flushed.set()
+
+    device = XTouchMini()
+    disconnect = connect_knob_to_property(device.knob[1], core, "Camera", "Gain")
+
+    # a fast sweep: the first value goes through immediately, the rest coalesce
+    for v in range(1, 128):
+        device.knob[1].changed.emit(v)
+    core.setProperty.assert_called_once_with("Camera", "Gain", 1.0)
+
+    # the latest value is flushed at the end of the throttle interval
+    assert flushed.wait(1)
+    assert core.setProperty.call_args_list == [
+        call("Camera", "Gain", 1.0),
+        call("Camera", "Gain", 127.0),
+    ]
+    disconnect()
+    device.close()
+
+
+def test_throttled_one_call_in_flight() -> None:
+    """Test that a slow function is never called concurrently by _Throttled."""
+    lock = threading.Lock()
+    active, max_active, calls = 0, 0, []
+    done = threading.Event()
+
+    def _slow(value: float) -> None:
+        nonlocal active, max_active
+        with lock:
+            active += 1
+            max_active = max(max_active, active)
+        time.sleep(0.02 if value else 0)  # the leading call (0) is fast
+        calls.append(value)
+        with lock:
+            active -= 1
+        if value == 49:
+            done.set()
+
+    # values arrive faster than the interval, which is shorter than a call
+    throttled = _Throttled(_slow, 0.005)
+    for v in range(50):
+        throttled(v)
+        time.sleep(0.001)
+    assert done.wait(1)
+    assert max_active == 1
+    assert calls == sorted(calls)  # older values never land last
+    throttled.cancel()
+
+
+def test_prefetch_reads_only_needed_fields() -> None:
+    core = Mock()
+    core.getPropertyFromCache.return_value = "1"
+    core.getAllowedPropertyValues.return_value = ("1", "2")
+    core.getPropertyLowerLimit.return_value = 0
+    core.getPropertyUpperLimit.return_value = 10
+    dmap = DeviceMap(
+        "X-TOUCH MINI",
+        [
+            ("knob", 2, *GAIN),
+            ("button", 9, *BINNING),
+            ("button", 10, None, None, "snap"),
+        ],
+    )
+    knob_info, button_info, none = dmap._prefetch(core)
+
+    assert knob_info == PropertyInfo("1", (0, 10), ())
+    assert button_info == PropertyInfo("1", None, ("1", "2"))
+    assert none is None
+    # values come from the cache, and each control only reads what it uses
+    core.getSystemState.assert_not_called()
+    core.getSystemStateCache.assert_not_called()
+    core.getProperty.assert_not_called()
+    core.hasPropertyLimits.assert_called_once_with(*GAIN)
+    core.getPropertyType.assert_called_once_with(*GAIN)
+    core.getAllowedPropertyValues.assert_called_once_with(*BINNING)
+
+
+def test_paused_property_events() -> None:
+    core = Mock()
+    cb = Capture()
+    disconnect = _connect_property(core, *GAIN, cb)
+    dispatcher = _get_dispatcher(core)
+
+    with paused_property_events(core):
+        dispatcher(*GAIN, "1")
+        with paused_property_events(core):
+            dispatcher(*GAIN, "2")
+        # leaving the inner context doesn't deliver anything
+        dispatcher(*GAIN, "3")
+        assert cb == []
+    # only the latest value is delivered, once
+    assert cb == [("3",)]
+
+    dispatcher(*GAIN, "4")
+    assert cb == [("3",), ("4",)]
+    disconnect()
+
+
+def test_one_dispatcher_per_core() -> None:
+    core, other_core = Mock(), Mock()
+    gain, binning, other = Capture(), Capture(), Capture()
+    disconnects = [
+        _connect_property(core, *GAIN, gain),
+        _connect_property(core, *BINNING, binning),
+        _connect_property(other_core, *GAIN, other),
+    ]
+    # each core is connected to once, no matter how many properties are listened to
+    core.events.propertyChanged.connect.assert_called_once_with(_get_dispatcher(core))
+    assert _get_dispatcher(other_core) is not _get_dispatcher(core)
+
+    # events are routed to the listeners of that property (on that core) only
+    _get_dispatcher(core)(*GAIN, "4")
+    assert (gain, binning, other) == ([("4",)], [], [])
+
+    for disconnect in disconnects:
+        disconnect()
+    _get_dispatcher(core)(*GAIN, "8")
+    assert gain == [("4",)]
+    assert not _get_dispatcher(core).listeners
+
+
+@pytest.mark.parametrize("current, expected", [("2", "4"), ("4", "1"), ("3", "1")])
+def test_button_cycles_allowed_values(mock_xtouch, current: str, expected: str) -> None:
+    """Test that a press sets the next allowed value (the first, if not allowed)."""
+    core = Mock()
+    core.getProperty.return_value = current
+    device = XTouchMini()
+    info = PropertyInfo(current, None, ("1", "2", "4"))
+    disconnect = connect_button_to_property(device.button[9], core, *BINNING, info)
+    device.button[9].released.emit()
+    core.setProperty.assert_called_once_with(*BINNING, expected)
     disconnect()
+    device.close()
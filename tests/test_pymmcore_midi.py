@@ -1,9 +1,23 @@
+import gc
+import threading
+import weakref
 from unittest.mock import MagicMock
 
 import mido
 import pytest
+from conftest import Capture, cc, note_off, note_on
 
-from pymmcore_midi import MidiDevice, XTouchMini
+from pymmcore_midi import Button, MidiDevice, XTouchMini
+
+# transport buttons of the X-Touch Mini: (attribute name, note)
+BUTTONS = (
+    ("rewind", 18),
+    ("fast_forward", 19),
+    ("loop", 20),
+    ("stop", 21),
+    ("play", 22),
+    ("record", 23),
+)
 
 
 def test_x_touch_output(mock_xtouch) -> None:
@@ -15,63 +29,242 @@ def test_x_touch_output(mock_xtouch) -> None:
     assert repr(mini.knob)
     assert 1 in mini.knob
 
-    buttons = {
-        "rewind": 18,
-        "fast_forward": 19,
-        "loop": 20,
-        "stop": 21,
-        "play": 22,
-        "record": 23,
-    }
-    for name, note in buttons.items():
-        btn = getattr(mini, name)
-        btn.press()
-        msg = mido.Message("note_on", channel=10, note=note, velocity=64, time=0)
-        mock_out.send.assert_called_once_with(msg)
-        mock_out.reset_mock()
-        btn.release()
-        msg = mido.Message("note_off", channel=10, note=note, velocity=64, time=0)
-        mock_out.send.assert_called_once_with(msg)
-        mock_out.reset_mock()
-
     knob4 = mini.knob[4]
     knob4.set_value(20)
-    msg = mido.Message("control_change", channel=10, control=4, value=20, time=0)
-    mock_out.send.assert_called_once_with(msg)
+    mock_out.send.assert_called_once_with(cc(4, 20))
+    mock_out.reset_mock()
+    knob4.set_value(20)
+    mock_out.send.assert_not_called()
+    with pytest.raises(ValueError, match="must be in range"):
+        knob4.set_value(128)
 
+    mock_out.reset_mock()
     mini.reset()
+    assert mock_out.send.call_count == 18 + 48
+    assert knob4.value == 0
+    mini.close()
+
+
+@pytest.mark.parametrize("name, note", BUTTONS)
+def test_transport_button(mock_xtouch, name: str, note: int) -> None:
+    """Test pressing and releasing a transport button of the X-Touch Mini."""
+    _, mock_out = mock_xtouch
+    mini = XTouchMini()
+    btn = getattr(mini, name)
+    btn.press()
+    mock_out.send.assert_called_once_with(note_on(note))
+    mock_out.reset_mock()
+    btn.release()
+    mock_out.send.assert_called_once_with(note_off(note))
+    mock_out.reset_mock()
+
+    # redundant messages are not sent
+    btn.release()
+    mock_out.send.assert_not_called()
     mini.close()
 
 
 def test_x_touch_intput(mock_xtouch) -> None:
     """Test receiving messages from the X-Touch Mini."""
-    mock_in, _ = mock_xtouch
     mini = XTouchMini()
     knob4 = mini.knob[4]
 
-    mock = MagicMock()
-    knob4.changed.connect(mock)
-    msg = mido.Message("control_change", channel=10, control=4, value=30, time=0)
-    mock_in.callback(msg)
-    mock.assert_called_once_with(30)
-    mock.reset_mock()
+    cb = Capture()
+    event_cb = Capture()
+    group_cb = Capture()
+    knob4.changed.connect(cb)
+    mini.event.connect(event_cb)
+    mini.knob.changed.connect(group_cb)
+    mini.button.released.connect(group_cb)
+    no_args: list = []
+    knob4.changed.connect(lambda: no_args.append(True))  # fewer args than emitted
+    mini.feed([cc(4, 30)])
+    assert cb == [(30,)]
+    assert no_args == [True]
+    assert event_cb == [("control_change", 4, 30)]
+    assert group_cb == [(4, 30)]
+    assert knob4.value == 30
+    cb.clear()
 
     btn3 = mini.button[3]
-    btn3.pressed.connect(mock)
-    msg = mido.Message("note_on", channel=10, note=3, velocity=64, time=0)
-    mock_in.callback(msg)
-    mock.assert_called_once()
-    mock.reset_mock()
+    btn3.pressed.connect(cb)
+    mini.feed([note_on(3)])
+    assert cb == [()]
+    cb.clear()
+
+    btn3.released.connect(cb)
+    mini.feed([note_off(3)])
+    assert cb == [()]
+    assert group_cb[-1] == (3,)
+
+    mini.close()
+
+
+def test_knob_burst_coalesced(mock_xtouch) -> None:
+    """Test that only the newest queued value of each knob is dispatched."""
+    mock_in, _ = mock_xtouch
+    mini = XTouchMini()
+
+    # block the worker thread in a button callback while a burst is queued
+    blocked, gate = threading.Event(), threading.Event()
+
+    def _block() -> None:
+        blocked.set()
+        gate.wait()
+
+    mini.button[3].pressed.connect(_block)
+
+    knob_cb = Capture()
+    mini.knob[4].changed.connect(knob_cb)
+    btn_cb = Capture()
+    mini.button[5].pressed.connect(btn_cb)
+
+    mock_in.callback(note_on(3))
+    assert blocked.wait(1)
+    for v in range(100):
+        mock_in.callback(cc(4, v))
+        if v == 50:
+            mock_in.callback(note_on(5))
+    gate.set()
+    mini.join()
+
+    assert knob_cb == [(99,)]
+    assert btn_cb == [()]
+    mini.close()
+
+
+def test_long_burst_keeps_events(mock_xtouch) -> None:
+    """Test that a long knob burst never pushes out note events or join markers."""
+    mock_in, _ = mock_xtouch
+    mini = XTouchMini()
+
+    blocked, gate = threading.Event(), threading.Event()
+
+    def _block() -> None:
+        blocked.set()
+        gate.wait()
+
+    mini.button[3].pressed.connect(_block)
+    knob_cb = Capture()
+    mini.knob[4].changed.connect(knob_cb)
+    btn_cb = Capture()
+    mini.button[5].pressed.connect(btn_cb)
 
-    btn3.released.connect(mock)
-    msg = mido.Message("note_off", channel=10, note=3, velocity=64, time=0)
-    mock_in.callback(msg)
-    mock.assert_called_once()
+    mock_in.callback(note_on(3))
+    assert blocked.wait(1)
+    mock_in.callback(note_on(5))
+    for v in range(1100):
+        mock_in.callback(cc(4, v % 128))
+    assert len(mini._rx) == 2  # the note, and knob 4 (once)
+    gate.set()
+    assert mini.join(timeout=1)
 
+    assert btn_cb == [()]
+    assert knob_cb[-1] == (1099 % 128,)
     mini.close()
 
 
-def test_cls_detect(mock_xtouch):
+def test_listener_error_logged(mock_xtouch, caplog) -> None:
+    """Test that an error in a listener is logged and doesn't stop the input."""
+    mock_in, _ = mock_xtouch
+    mini = XTouchMini()
+
+    def _bad() -> None:
+        raise ValueError("bad listener")
+
+    mini.button[3].pressed.connect(_bad)
+    cb = Capture()
+    mini.button[5].pressed.connect(cb)
+
+    mock_in.callback(note_on(3))
+    mock_in.callback(note_on(5))
+    mini.join()
+    assert cb == [()]
+    assert "bad listener" in caplog.text
+    mini.close()
+
+
+def test_unclosed_device_collected(mock_xtouch) -> None:
+    """Test that a device that is never closed can be garbage collected."""
+    mock_in, _ = mock_xtouch
+    mini = XTouchMini()
+    ref, thread = weakref.ref(mini), mini._rx_thread
+    mock_in.callback = None  # like a closed port, don't keep the device alive
+    del mini
+    gc.collect()
+    assert ref() is None
+    thread.join(1)
+    assert not thread.is_alive()
+
+
+def test_unsubscribed_controls_skipped(mock_xtouch, monkeypatch) -> None:
+    """Test that messages nobody listens to are not dispatched."""
+    mock_in, _ = mock_xtouch
+    mini = XTouchMini()
+    dispatch = MagicMock(wraps=mini._dispatch)
+    monkeypatch.setattr(mini, "_dispatch", dispatch)
+
+    mock_in.callback(cc(5, 12))
+    mock_in.callback(note_on(5))
+    mini.join()
+    dispatch.assert_not_called()
+    assert mini.knob[5].value == 12  # the knob state is still tracked
+
+    mini.button[5].pressed.connect(Capture())
+    mock_in.callback(note_on(5))
+    mini.join()
+    dispatch.assert_called_once()
+    mini.close()
+
+
+class _RtOutput:
+    """Stand-in for an output port of mido's rtmidi backend."""
+
+    __module__ = "mido.backends.rtmidi"
+
+    def __init__(self, private_attrs: bool = True) -> None:
+        self.closed = False
+        self.sent: list = []
+        if private_attrs:
+            self._rt = MagicMock()
+            self._rt.send_message.side_effect = self.sent.append
+            self._send_lock = threading.RLock()
+
+    def send(self, msg: mido.Message) -> None:
+        if self.closed:
+            raise ValueError("send() called on closed port")
+        self.sent.append(msg.bytes())
+
+
+@pytest.mark.parametrize("private_attrs", [True, False])
+def test_raw_sender(private_attrs: bool) -> None:
+    output = _RtOutput(private_attrs)
+    btn = Button(3, output)
+    btn.press()
+    assert [bytes(b) for b in output.sent] == [bytes(note_on(3).bytes())]
+    output.closed = True
+    with pytest.raises(ValueError, match="closed port"):
+        btn.release()
+
+
+def test_cls_detect(mock_xtouch, monkeypatch):
+    # don't leak the subclasses defined here into other tests
+    monkeypatch.setattr(MidiDevice, "_REGISTRY", dict(MidiDevice._REGISTRY))
     assert isinstance(MidiDevice.from_name("X-TOUCH MINI"), XTouchMini)
     with pytest.raises(KeyError):
         MidiDevice.from_name("X-Tasdfdsf")
+
+    class OtherDevice(MidiDevice):
+        DEVICE_NAME = "OTHER DEVICE"
+
+    # only subclasses of the class it is called on are returned
+    with pytest.raises(KeyError, match="No Subclass of XTouchMini"):
+        XTouchMini.from_name("OTHER DEVICE")
+
+    # the first implementation of a device name is kept
+    with pytest.warns(RuntimeWarning, match="DuplicateDevice not registered"):
+
+        class DuplicateDevice(MidiDevice):
+            DEVICE_NAME = "OTHER DEVICE"
+
+    assert MidiDevice._REGISTRY["OTHER DEVICE"] is OtherDevice